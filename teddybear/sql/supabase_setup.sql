@@ -0,0 +1,76 @@
+-- Supabase schema additions required by the KAMIS scraper.
+-- Safe to re-run in the Supabase SQL editor: constraints are only added if missing.
+
+-- Unique keys used as upsert conflict targets
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'counties_name_key') THEN
+        ALTER TABLE counties
+            ADD CONSTRAINT counties_name_key UNIQUE (name);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'commodities_name_key') THEN
+        ALTER TABLE commodities
+            ADD CONSTRAINT commodities_name_key UNIQUE (name);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'markets_name_county_id_key') THEN
+        ALTER TABLE markets
+            ADD CONSTRAINT markets_name_county_id_key UNIQUE (name, county_id);
+    END IF;
+END
+$$;
+
+-- A market can report several varieties/grades of a commodity on the same day,
+-- and those columns are NULL when the KAMIS table does not have them
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'price_records_record_key') THEN
+        -- Remove exact duplicates stored by earlier versions, keeping the oldest row
+        DELETE FROM price_records a
+        USING price_records b
+        WHERE a.id > b.id
+            AND a.commodity_id = b.commodity_id
+            AND a.market_id = b.market_id
+            AND a.record_date = b.record_date
+            AND a.classification IS NOT DISTINCT FROM b.classification
+            AND a.grade IS NOT DISTINCT FROM b.grade
+            AND a.sex IS NOT DISTINCT FROM b.sex;
+
+        ALTER TABLE price_records
+            ADD CONSTRAINT price_records_record_key
+            UNIQUE NULLS NOT DISTINCT (commodity_id, market_id, record_date, classification, grade, sex);
+    END IF;
+END
+$$;
+
+-- Bulk insert for price records, called via supabase.rpc() with a JSON array.
+-- Duplicates are skipped and the number of inserted rows is returned.
+CREATE OR REPLACE FUNCTION insert_price_records_bulk(records jsonb)
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH inserted AS (
+        INSERT INTO price_records (
+            commodity_id, market_id, classification, grade, sex,
+            wholesale_price, retail_price, supply_volume, record_date
+        )
+        SELECT
+            commodity_id, market_id, classification, grade, sex,
+            wholesale_price, retail_price, supply_volume, record_date
+        FROM jsonb_to_recordset(records) AS r(
+            commodity_id bigint,
+            market_id bigint,
+            classification text,
+            grade text,
+            sex text,
+            wholesale_price numeric,
+            retail_price numeric,
+            supply_volume numeric,
+            record_date date
+        )
+        ON CONFLICT (commodity_id, market_id, record_date, classification, grade, sex) DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM inserted;
+$$;
@@ -5,17 +5,20 @@ Scrapes agricultural commodity prices and stores them in Supabase PostgreSQL
 
 import os
 import re
+import asyncio
 import sys
 import time
 import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from decimal import Decimal, InvalidOperation
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import lxml.html
 from dotenv import load_dotenv
+from pybloom_live import ScalableBloomFilter
 from supabase import create_client, Client
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -23,22 +26,58 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 load_dotenv()
 
 # Configure logging
+LOG_MAX_BYTES = 10_000_000  # Rotate scraper.log at ~10 MB
+LOG_BACKUP_COUNT = 5
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('scraper.log'),
+        logging.handlers.RotatingFileHandler('scraper.log', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
+# httpx logs every page fetch and Supabase call at INFO
+logging.getLogger('httpx').setLevel(logging.WARNING)
 
 # Configuration
 BASE_URL = "https://kamis.kilimo.go.ke/site/market"
-BATCH_SIZE = 100  # Insert records in batches
+BATCH_SIZE = 1000  # Insert records in batches
+PRICE_RECORD_KEY = 'commodity_id,market_id,record_date,classification,grade,sex'  # Unique key used to skip duplicates
+EXISTING_PAGE_SIZE = 1000  # Rows per page when checking stored records, the PostgREST default limit
+BULK_INSERT_FUNCTION = 'insert_price_records_bulk'  # Postgres function, see sql/supabase_setup.sql
 REQUEST_DELAY = 1.5  # Seconds between requests
+REQUEST_RATE = 1 / REQUEST_DELAY  # Requests started per second across all workers
+MAX_CONCURRENT_REQUESTS = 10  # Product pages fetched in parallel
+POOL_CONNECTIONS = 50  # Connections kept open for reuse
+BLOOM_FILE = 'records.bloom'  # Persisted filter of price records already stored
+BLOOM_ERROR_RATE = 1e-4
 MAX_RETRIES = 3
 
+# Product name keywords used to assign commodity categories
+CATEGORY_KEYWORDS = {
+    'Grains': ['maize', 'beans', 'rice', 'wheat', 'sorghum', 'millet', 'greengrams', 'ndengu'],
+    'Vegetables': ['cabbage', 'kale', 'spinach', 'tomato', 'onion', 'potato', 'carrot', 'pepper', 'eggplant', 'lettuce'],
+    'Fruits': ['mango', 'banana', 'orange', 'apple', 'pineapple', 'watermelon', 'avocado', 'passion'],
+    'Livestock': ['cattle', 'goat', 'sheep', 'pig', 'chicken', 'broiler', 'layer', 'beef', 'mutton'],
+    'Fish': ['fish', 'tilapia', 'nile perch', 'omena', 'sardine']
+}
+DEFAULT_CATEGORY = 'Other'
+
+# Date formats tried in order; day-first always comes before month-first
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']
+MONTH_FIRST_DATE_FORMAT = '%m/%d/%Y'
+
+# Precompiled patterns used when parsing table cells
+_PRICE_RE = re.compile(r'[^\d.]')
+_NUM_RE = re.compile(r'\d[\d,]*')
+# Common market patterns: "Market Name - County", "Market Name (County)", "Market Name, County"
+_MARKET_PATTERNS = [
+    re.compile(r'(.+?)\s*[-–]\s*(.+)'),
+    re.compile(r'(.+?)\s*\((.+?)\)'),
+    re.compile(r'(.+?)\s*,\s*(.+)')
+]
+
 # Supabase Configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
@@ -47,18 +86,18 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     raise ValueError("Missing Supabase credentials in .env file")
 
 
-@dataclass
+@dataclass(slots=True)
 class ScrapedRecord:
-    """Represents a single price record from KAMIS"""
+    """Represents a single price record from KAMIS, with normalized names"""
     product_name: str
     market_name: str
     county_name: str
     classification: Optional[str]
     grade: Optional[str]
     sex: Optional[str]
-    wholesale_price: Optional[Decimal]
-    retail_price: Optional[Decimal]
-    supply_volume: Optional[Decimal]
+    wholesale_price: Optional[float]
+    retail_price: Optional[float]
+    supply_volume: Optional[float]
     price_date: date
 
 
@@ -73,224 +112,324 @@ class DatabaseManager:
             'markets': {},
             'categories': {}
         }
+        self.bloom = self._load_bloom()
         self._initialize_categories()
     
-    def _initialize_categories(self):
-        """Pre-populate commodity categories if empty"""
-        categories = ['Grains', 'Vegetables', 'Fruits', 'Livestock', 'Fish', 'Other']
-        for cat_name in categories:
-            existing = self.supabase.table('commodity_categories')\
-                .select('id').eq('name', cat_name).execute()
-            if not existing.data:
-                self.supabase.table('commodity_categories')\
-                    .insert({'name': cat_name}).execute()
-                logger.info(f"Created category: {cat_name}")
+    def _load_bloom(self) -> ScalableBloomFilter:
+        """Load the persisted filter of stored price records, or start a new one"""
+        if os.path.exists(BLOOM_FILE):
+            try:
+                with open(BLOOM_FILE, 'rb') as f:
+                    return ScalableBloomFilter.fromfile(f)
+            except Exception as e:
+                logger.warning(f"Could not load {BLOOM_FILE}, starting a new filter: {e}")
+        return ScalableBloomFilter(error_rate=BLOOM_ERROR_RATE)
+    
+    def save_bloom(self):
+        """Persist the filter of stored price records for the next run"""
+        with open(BLOOM_FILE, 'wb') as f:
+            self.bloom.tofile(f)
+    
+    @staticmethod
+    def _record_key(row: Dict) -> str:
+        """Key identifying a price record in the Bloom filter"""
+        return (
+            f"{row['commodity_id']}|{row['market_id']}|{row['record_date']}|"
+            f"{row['classification']}|{row['grade']}|{row['sex']}"
+        )
     
-    def _get_or_create_county(self, name: str) -> int:
-        """Get county ID or create if not exists"""
-        name = name.strip().title()
-        if name in self._cache['counties']:
-            return self._cache['counties'][name]
+    def _initialize_categories(self):
+        """Pre-populate commodity categories if empty and cache their IDs"""
+        categories = [*CATEGORY_KEYWORDS, DEFAULT_CATEGORY]
+        cache = self._cache['categories']
         
-        # Try to find existing
-        result = self.supabase.table('counties').select('id').eq('name', name).execute()
-        if result.data:
-            county_id = result.data[0]['id']
-        else:
-            # Create new
-            result = self.supabase.table('counties').insert({'name': name}).execute()
-            county_id = result.data[0]['id']
-            logger.info(f"Created new county: {name}")
+        result = self.supabase.table('commodity_categories').select('id,name').execute()
+        for row in result.data:
+            cache[row['name']] = row['id']
         
-        self._cache['counties'][name] = county_id
-        return county_id
+        missing = [cat_name for cat_name in categories if cat_name not in cache]
+        if missing:
+            result = self.supabase.table('commodity_categories')\
+                .insert([{'name': cat_name} for cat_name in missing]).execute()
+            for row in result.data:
+                cache[row['name']] = row['id']
+                logger.info(f"Created category: {row['name']}")
     
-    def _get_or_create_commodity(self, product_name: str) -> int:
-        """Get commodity ID or create if not exists"""
-        name = product_name.strip().title()
-        if name in self._cache['commodities']:
-            return self._cache['commodities'][name]
+    def _fetch_ids_by_name(self, table: str, names: set) -> Dict[str, int]:
+        """Look up IDs for the given names in a table keyed by name"""
+        result = self.supabase.table(table).select('id,name').in_('name', list(names)).execute()
+        return {row['name']: row['id'] for row in result.data}
+    
+    def _bulk_resolve_counties(self, names: set) -> Dict[str, int]:
+        """Get county IDs for a set of names, creating missing ones in one insert"""
+        cache = self._cache['counties']
+        missing = names - cache.keys()
         
-        # Determine category based on product name keywords
-        category_id = self._categorize_product(name)
+        if missing:
+            # Try to find existing
+            cache.update(self._fetch_ids_by_name('counties', missing))
+            missing -= cache.keys()
         
-        # Try to find existing
-        result = self.supabase.table('commodities')\
-            .select('id').eq('name', name).execute()
+        if missing:
+            # Create new; names another run created meanwhile are skipped and looked up again
+            result = self.supabase.table('counties')\
+                .upsert([{'name': name} for name in missing], on_conflict='name', ignore_duplicates=True)\
+                .execute()
+            for row in result.data:
+                cache[row['name']] = row['id']
+            missing -= cache.keys()
+            if missing:
+                cache.update(self._fetch_ids_by_name('counties', missing))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Created {len(result.data)} counties")
         
-        if result.data:
-            commodity_id = result.data[0]['id']
-        else:
-            # Create new
-            result = self.supabase.table('commodities').insert({
-                'name': name,
-                'category_id': category_id
-            }).execute()
-            commodity_id = result.data[0]['id']
-            logger.info(f"Created new commodity: {name} (Category ID: {category_id})")
+        return {name: cache[name] for name in names}
+    
+    def _bulk_resolve_commodities(self, names: set) -> Dict[str, int]:
+        """Get commodity IDs for a set of names, creating missing ones in one insert"""
+        cache = self._cache['commodities']
+        missing = names - cache.keys()
+        
+        if missing:
+            # Try to find existing
+            cache.update(self._fetch_ids_by_name('commodities', missing))
+            missing -= cache.keys()
+        
+        if missing:
+            # Create new, categorized by product name keywords. Existing commodities are never
+            # rewritten, so categories set by hand are kept
+            result = self.supabase.table('commodities').upsert([
+                {'name': name, 'category_id': self._categorize_product(name)}
+                for name in missing
+            ], on_conflict='name', ignore_duplicates=True).execute()
+            for row in result.data:
+                cache[row['name']] = row['id']
+            missing -= cache.keys()
+            if missing:
+                cache.update(self._fetch_ids_by_name('commodities', missing))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Created {len(result.data)} commodities")
         
-        self._cache['commodities'][name] = commodity_id
-        return commodity_id
+        return {name: cache[name] for name in names}
     
     def _categorize_product(self, product_name: str) -> Optional[int]:
         """Categorize product based on name keywords"""
         name_lower = product_name.lower()
+        categories = self._cache['categories']
         
-        category_map = {
-            'Grains': ['maize', 'beans', 'rice', 'wheat', 'sorghum', 'millet', 'greengrams', 'ndengu'],
-            'Vegetables': ['cabbage', 'kale', 'spinach', 'tomato', 'onion', 'potato', 'carrot', 'pepper', 'eggplant', 'lettuce'],
-            'Fruits': ['mango', 'banana', 'orange', 'apple', 'pineapple', 'watermelon', 'avocado', 'passion'],
-            'Livestock': ['cattle', 'goat', 'sheep', 'pig', 'chicken', 'broiler', 'layer', 'beef', 'mutton'],
-            'Fish': ['fish', 'tilapia', 'nile perch', 'omena', 'sardine']
-        }
-        
-        for category, keywords in category_map.items():
-            if any(keyword in name_lower for keyword in keywords):
-                result = self.supabase.table('commodity_categories')\
-                    .select('id').eq('name', category).execute()
-                if result.data:
-                    return result.data[0]['id']
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            if any(keyword in name_lower for keyword in keywords) and category in categories:
+                return categories[category]
         
         # Default to 'Other'
-        result = self.supabase.table('commodity_categories')\
-            .select('id').eq('name', 'Other').execute()
-        return result.data[0]['id'] if result.data else None
+        return categories.get(DEFAULT_CATEGORY)
     
-    def _get_or_create_market(self, market_name: str, county_name: str) -> int:
-        """Get market ID or create if not exists"""
-        cache_key = f"{market_name.strip().title()}_{county_name.strip().title()}"
-        if cache_key in self._cache['markets']:
-            return self._cache['markets'][cache_key]
-        
-        county_id = self._get_or_create_county(county_name)
-        market_name_clean = market_name.strip().title()
-        
-        # Try to find existing
+    def _fetch_market_ids(self, keys: set) -> Dict[Tuple[str, int], int]:
+        """Look up IDs for the given (name, county_id) market keys"""
         result = self.supabase.table('markets')\
-            .select('id')\
-            .eq('name', market_name_clean)\
-            .eq('county_id', county_id)\
+            .select('id,name,county_id')\
+            .in_('name', list({name for name, _ in keys}))\
+            .in_('county_id', list({county_id for _, county_id in keys}))\
             .execute()
+        return {
+            (row['name'], row['county_id']): row['id']
+            for row in result.data
+            if (row['name'], row['county_id']) in keys
+        }
+    
+    def _bulk_resolve_markets(self, pairs: set) -> Dict[Tuple[str, str], int]:
+        """Get market IDs for (market_name, county_name) pairs, creating missing ones in one insert"""
+        cache = self._cache['markets']
+        county_ids = self._bulk_resolve_counties({county_name for _, county_name in pairs})
         
-        if result.data:
-            market_id = result.data[0]['id']
-        else:
-            # Create new
-            result = self.supabase.table('markets').insert({
-                'name': market_name_clean,
-                'county_id': county_id
-            }).execute()
-            market_id = result.data[0]['id']
-            logger.info(f"Created new market: {market_name_clean} in {county_name}")
+        # Markets are cached by (name, county_id)
+        keys = {
+            (market_name, county_name): (market_name, county_ids[county_name])
+            for market_name, county_name in pairs
+        }
+        missing = set(keys.values()) - cache.keys()
+        
+        if missing:
+            # Try to find existing
+            cache.update(self._fetch_market_ids(missing))
+            missing -= cache.keys()
         
-        self._cache['markets'][cache_key] = market_id
-        return market_id
+        if missing:
+            # Create new; markets another run created meanwhile are skipped and looked up again
+            result = self.supabase.table('markets').upsert([
+                {'name': name, 'county_id': county_id}
+                for name, county_id in missing
+            ], on_conflict='name,county_id', ignore_duplicates=True).execute()
+            for row in result.data:
+                cache[(row['name'], row['county_id'])] = row['id']
+            missing -= cache.keys()
+            if missing:
+                cache.update(self._fetch_market_ids(missing))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Created {len(result.data)} markets")
+        
+        return {pair: cache[key] for pair, key in keys.items()}
     
     def insert_price_records(self, records: List[ScrapedRecord]) -> int:
         """Insert price records in batches, skipping duplicates"""
         if not records:
             return 0
         
-        inserted_count = 0
-        batch = []
+        # Resolve foreign keys for the whole batch up front
+        try:
+            commodity_ids = self._bulk_resolve_commodities({r.product_name for r in records})
+            market_ids = self._bulk_resolve_markets({(r.market_name, r.county_name) for r in records})
+        except Exception as e:
+            logger.error(f"Error resolving commodities/markets for insert: {e}")
+            return 0
         
-        for record in records:
+        # Records go straight to insert rows in a single pass
+        rows = [
+            {
+                'commodity_id': commodity_ids[record.product_name],
+                'market_id': market_ids[(record.market_name, record.county_name)],
+                'classification': record.classification,
+                'grade': record.grade,
+                'sex': record.sex,
+                'wholesale_price': record.wholesale_price,
+                'retail_price': record.retail_price,
+                'supply_volume': record.supply_volume,
+                'record_date': record.price_date.isoformat()
+            }
+            for record in records
+        ]
+        
+        # Rows the filter has seen are probably stored already; confirm them in one query
+        seen = [row for row in rows if self._record_key(row) in self.bloom]
+        if seen:
             try:
-                commodity_id = self._get_or_create_commodity(record.product_name)
-                market_id = self._get_or_create_market(record.market_name, record.county_name)
-                
-                # Check for existing record to avoid duplicates
-                existing = self.supabase.table('price_records')\
-                    .select('id')\
-                    .eq('commodity_id', commodity_id)\
-                    .eq('market_id', market_id)\
-                    .eq('record_date', record.price_date.isoformat())\
-                    .execute()
-                
-                if existing.data:
-                    logger.debug(f"Skipping duplicate: {record.product_name} at {record.market_name} on {record.price_date}")
-                    continue
-                
-                batch.append({
-                    'commodity_id': commodity_id,
-                    'market_id': market_id,
-                    'classification': record.classification,
-                    'grade': record.grade,
-                    'sex': record.sex,
-                    'wholesale_price': float(record.wholesale_price) if record.wholesale_price else None,
-                    'retail_price': float(record.retail_price) if record.retail_price else None,
-                    'supply_volume': float(record.supply_volume) if record.supply_volume else None,
-                    'record_date': record.price_date.isoformat()
-                })
-                
-                # Insert in batches
-                if len(batch) >= BATCH_SIZE:
-                    inserted_count += self._execute_batch_insert(batch)
-                    batch = []
-                    
+                existing = self._fetch_existing_keys(seen)
+                unseen = [row for row in rows if self._record_key(row) not in existing]
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Skipping {len(rows) - len(unseen)} records already stored")
+                rows = unseen
             except Exception as e:
-                logger.error(f"Error preparing record for insert: {e}")
-                continue
+                # The upsert still skips duplicates, so just send everything
+                logger.error(f"Failed to check stored records: {e}")
         
-        # Insert remaining
-        if batch:
-            inserted_count += self._execute_batch_insert(batch)
+        inserted_count = 0
+        
+        # Insert in batches
+        for start in range(0, len(rows), BATCH_SIZE):
+            inserted_count += self._execute_batch_insert(rows[start:start + BATCH_SIZE])
         
         return inserted_count
     
+    def _fetch_existing_keys(self, rows: List[Dict]) -> set:
+        """Fetch keys of the given price records that are already stored"""
+        keys = {self._record_key(row) for row in rows}
+        existing = set()
+        start = 0
+        
+        # The filters match every combination of the values, so page through the
+        # result rather than relying on it fitting under the PostgREST row limit
+        while True:
+            result = self.supabase.table('price_records')\
+                .select(PRICE_RECORD_KEY)\
+                .in_('commodity_id', list({row['commodity_id'] for row in rows}))\
+                .in_('market_id', list({row['market_id'] for row in rows}))\
+                .in_('record_date', list({row['record_date'] for row in rows}))\
+                .order('id')\
+                .range(start, start + EXISTING_PAGE_SIZE - 1)\
+                .execute()
+            existing.update(key for key in map(self._record_key, result.data) if key in keys)
+            if len(result.data) < EXISTING_PAGE_SIZE:
+                return existing
+            start += EXISTING_PAGE_SIZE
+    
     def _execute_batch_insert(self, batch: List[Dict]) -> int:
-        """Execute batch insert with error handling"""
+        """Execute batch insert with error handling, skipping duplicates"""
         try:
-            result = self.supabase.table('price_records').insert(batch).execute()
-            logger.info(f"Inserted batch of {len(result.data)} records")
-            return len(result.data)
+            # Server-side INSERT ... SELECT with ON CONFLICT DO NOTHING, returns inserted count
+            result = self.supabase.rpc(BULK_INSERT_FUNCTION, {'records': batch}).execute()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Inserted batch of {result.data} records")
+            # Every row in the batch is now stored, whether inserted or skipped
+            for item in batch:
+                self.bloom.add(self._record_key(item))
+            return result.data
         except Exception as e:
             logger.error(f"Batch insert failed: {e}")
             # Try individual inserts as fallback
             success_count = 0
             for item in batch:
                 try:
-                    self.supabase.table('price_records').insert(item).execute()
-                    success_count += 1
+                    result = self.supabase.rpc(BULK_INSERT_FUNCTION, {'records': [item]}).execute()
+                    success_count += result.data
+                    self.bloom.add(self._record_key(item))
                 except Exception as inner_e:
                     logger.error(f"Individual insert failed: {inner_e}")
             return success_count
 
 
+class RateLimiter:
+    """Token bucket limiting how many requests are started per second"""
+    
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a request slot is available"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
 class KAMISScraper:
     """Main scraper class for KAMIS website"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Connection': 'keep-alive'
+        }
+        self.rate_limiter = RateLimiter(REQUEST_RATE)
         self.db = DatabaseManager()
     
     @retry(stop=stop_after_attempt(MAX_RETRIES), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def _fetch(self, url: str) -> BeautifulSoup:
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> lxml.html.HtmlElement:
         """Fetch URL with retry logic"""
-        response = self.session.get(url, timeout=30)
-        response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
+        await self.rate_limiter.acquire()
+        # Feed the body to the parser as it arrives instead of buffering the whole page
+        parser = lxml.html.HTMLParser()
+        async with client.stream('GET', url, timeout=30) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+        return parser.close()
     
-    def get_product_list(self) -> List[Dict]:
+    async def get_product_list(self, client: httpx.AsyncClient) -> List[Dict]:
         """Fetch available products from dropdown"""
         logger.info("Fetching product list...")
         try:
-            soup = self._fetch(BASE_URL)
-            select = soup.find('select', {'name': 'product'})
+            tree = await self._fetch(client, BASE_URL)
+            selects = tree.cssselect('select[name="product"]')
             
-            if not select:
+            if not selects:
                 raise ValueError("Could not find product dropdown")
             
             products = []
-            for opt in select.find_all('option'):
+            for opt in selects[0].iter('option'):
                 value = opt.get('value')
                 if value and value.isdigit():
                     products.append({
                         'id': int(value),
-                        'name': opt.text.strip()
+                        'name': opt.text_content().strip()
                     })
             
             logger.info(f"Found {len(products)} products")
@@ -300,78 +439,121 @@ class KAMISScraper:
             logger.error(f"Failed to fetch product list: {e}")
             raise
     
-    def _parse_price(self, value: str) -> Optional[Decimal]:
-        """Parse price string to Decimal"""
+    def _parse_price(self, value: str) -> Optional[float]:
+        """Parse price string to float"""
         if not value or value in ('-', '', 'N/A'):
             return None
         # Remove non-numeric characters except decimal point
-        cleaned = re.sub(r'[^\d.]', '', value)
+        cleaned = _PRICE_RE.sub('', value)
         try:
-            return Decimal(cleaned) if cleaned else None
-        except InvalidOperation:
+            return float(cleaned) if cleaned else None
+        except ValueError:
             return None
     
-    def _parse_volume(self, value: str) -> Optional[Decimal]:
-        """Parse volume/supply string to Decimal"""
+    def _parse_volume(self, value: str) -> Optional[float]:
+        """Parse volume/supply string to float"""
         if not value or value in ('-', '', 'N/A'):
             return None
         # Extract number from strings like "5000 kg", "High", "Low"
-        numbers = re.findall(r'\d+', value.replace(',', ''))
-        if numbers:
+        match = _NUM_RE.search(value)
+        if match:
             try:
-                return Decimal(numbers[0])
-            except InvalidOperation:
+                return float(match.group().replace(',', ''))
+            except ValueError:
                 return None
         return None
     
-    def _parse_date(self, value: str) -> date:
-        """Parse date string to date object"""
-        # Try common formats
-        formats = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']
-        for fmt in formats:
+    def _parse_date(self, value: str, formats: List[str]) -> date:
+        """Parse date string to date object, trying the page's formats in order"""
+        value = value.strip()
+        # ISO dates are the common case and fromisoformat is much cheaper than strptime
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+        for i, fmt in enumerate(formats):
             try:
-                return datetime.strptime(value.strip(), fmt).date()
+                parsed = datetime.strptime(value, fmt).date()
             except ValueError:
                 continue
+            # Try the format that worked first for the rest of the page, but never
+            # let month-first run ahead of day-first for ambiguous dates like 01/02/2024
+            if i and fmt != MONTH_FIRST_DATE_FORMAT:
+                formats.insert(0, formats.pop(i))
+            return parsed
         # Default to today if parsing fails
         logger.warning(f"Could not parse date: {value}, using today")
         return date.today()
     
     def _extract_county_from_market(self, market_text: str) -> Tuple[str, str]:
         """Extract market name and county from combined text"""
-        # Common patterns: "Market Name - County" or "Market Name (County)"
-        patterns = [
-            r'(.+?)\s*[-–]\s*(.+)',
-            r'(.+?)\s*\((.+?)\)',
-            r'(.+?)\s*,\s*(.+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.match(pattern, market_text)
+        for pattern in _MARKET_PATTERNS:
+            match = pattern.match(market_text)
             if match:
                 return match.group(1).strip(), match.group(2).strip()
         
         # If no pattern matches, return as-is with unknown county
         return market_text.strip(), "Unknown"
     
-    def scrape_product(self, product_id: int, product_name: str, per_page: int = 100) -> List[ScrapedRecord]:
+    def _row_to_record(self, cells: list, present: List[Tuple[str, int]], has_county: bool,
+                       product_name: str, date_formats: List[str]) -> Optional[ScrapedRecord]:
+        """Build a record from the cells of one table row"""
+        n_cells = len(cells)
+        if n_cells < 3:  # Skip malformed rows
+            return None
+        
+        row_vals = {key: cells[i].text_content().strip() for key, i in present if i < n_cells}
+        
+        # Extract market and county
+        market_text = row_vals.get('market', "")
+        
+        # If county column exists use it, otherwise extract from market text
+        if has_county:
+            market_name = market_text
+            county_name = row_vals.get('county', "")
+        else:
+            market_name, county_name = self._extract_county_from_market(market_text)
+        # Interned so the many repeats share one object and hash cheaply as cache keys
+        market_name = sys.intern(market_name.strip().title())
+        county_name = sys.intern((county_name or "Unknown").strip().title())
+        
+        # Parse date
+        price_date = self._parse_date(row_vals['date'], date_formats) if 'date' in row_vals else date.today()
+        
+        return ScrapedRecord(
+            product_name=product_name,
+            market_name=market_name,
+            county_name=county_name,
+            classification=row_vals.get('classification'),
+            grade=row_vals.get('grade'),
+            sex=row_vals.get('sex'),
+            wholesale_price=self._parse_price(row_vals.get('wholesale', "")),
+            retail_price=self._parse_price(row_vals.get('retail', "")),
+            supply_volume=self._parse_volume(row_vals.get('volume', "")),
+            price_date=price_date
+        )
+    
+    async def scrape_product(self, client: httpx.AsyncClient, product_id: int, product_name: str,
+                             per_page: int = 100) -> List[ScrapedRecord]:
         """Scrape all data for a specific product"""
         url = f"{BASE_URL}?product={product_id}&per_page={per_page}"
-        logger.info(f"Scraping: {product_name} (ID: {product_id})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Scraping: {product_name} (ID: {product_id})")
         
         try:
-            soup = self._fetch(url)
-            table = soup.find('table', class_='table table-bordered table-condensed')
+            tree = await self._fetch(client, url)
+            tables = tree.cssselect('table.table.table-bordered.table-condensed')
             
-            if not table:
+            if not tables:
                 logger.warning(f"No data table found for {product_name}")
                 return []
+            table = tables[0]
             
             # Extract headers
             headers = []
             thead = table.find('thead')
-            if thead:
-                headers = [th.get_text(strip=True).lower() for th in thead.find_all('th')]
+            if thead is not None:
+                headers = [th.text_content().strip().lower() for th in thead.iter('th')]
             
             # Map common header variations
             header_map = {
@@ -386,103 +568,79 @@ class KAMISScraper:
                 'date': ['date', 'price date', 'recorded date']
             }
             
-            def find_column_index(target):
-                for key, variants in header_map.items():
-                    if target == key:
-                        for i, h in enumerate(headers):
-                            if any(v in h for v in variants):
-                                return i
+            def find_column_index(variants):
+                for i, h in enumerate(headers):
+                    if any(v in h for v in variants):
+                        return i
                 return -1
             
-            idx_map = {
-                'market': find_column_index('market'),
-                'county': find_column_index('county'),
-                'classification': find_column_index('classification'),
-                'grade': find_column_index('grade'),
-                'sex': find_column_index('sex'),
-                'wholesale': find_column_index('wholesale'),
-                'retail': find_column_index('retail'),
-                'volume': find_column_index('volume'),
-                'date': find_column_index('date')
-            }
+            idx_map = {key: find_column_index(variants) for key, variants in header_map.items()}
+            # Only the columns present in this table, resolved once for all rows
+            present = [(key, i) for key, i in idx_map.items() if i >= 0]
+            has_county = idx_map['county'] >= 0
+            
+            # Names are normalized once here and used as-is for database cache keys
+            product_name = sys.intern(product_name.strip().title())
             
-            records = []
             tbody = table.find('tbody')
-            if not tbody:
+            if tbody is None:
                 return []
             
-            for row in tbody.find_all('tr'):
-                cells = row.find_all('td')
-                if len(cells) < 3:  # Skip malformed rows
-                    continue
-                
-                # Extract market and county
-                market_text = cells[idx_map['market']].get_text(strip=True) if idx_map['market'] >= 0 else ""
-                
-                # If county column exists use it, otherwise extract from market text
-                if idx_map['county'] >= 0:
-                    market_name = market_text
-                    county_name = cells[idx_map['county']].get_text(strip=True)
-                else:
-                    market_name, county_name = self._extract_county_from_market(market_text)
-                
-                # Parse date
-                date_text = cells[idx_map['date']].get_text(strip=True) if idx_map['date'] >= 0 else str(date.today())
-                price_date = self._parse_date(date_text)
-                
-                record = ScrapedRecord(
-                    product_name=product_name,
-                    market_name=market_name,
-                    county_name=county_name or "Unknown",
-                    classification=cells[idx_map['classification']].get_text(strip=True) if idx_map['classification'] >= 0 else None,
-                    grade=cells[idx_map['grade']].get_text(strip=True) if idx_map['grade'] >= 0 else None,
-                    sex=cells[idx_map['sex']].get_text(strip=True) if idx_map['sex'] >= 0 else None,
-                    wholesale_price=self._parse_price(
-                        cells[idx_map['wholesale']].get_text(strip=True) if idx_map['wholesale'] >= 0 else ""
-                    ),
-                    retail_price=self._parse_price(
-                        cells[idx_map['retail']].get_text(strip=True) if idx_map['retail'] >= 0 else ""
-                    ),
-                    supply_volume=self._parse_volume(
-                        cells[idx_map['volume']].get_text(strip=True) if idx_map['volume'] >= 0 else ""
-                    ),
-                    price_date=price_date
+            # Date formats are reordered as rows parse, so each page gets its own copy
+            date_formats = list(DATE_FORMATS)
+            records = [
+                record for record in (
+                    self._row_to_record(row.findall('td'), present, has_county, product_name, date_formats)
+                    for row in tbody.iterfind('tr')
                 )
-                
-                records.append(record)
+                if record is not None
+            ]
             
-            logger.info(f"Scraped {len(records)} records for {product_name}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Scraped {len(records)} records for {product_name}")
             return records
             
         except Exception as e:
             logger.error(f"Error scraping {product_name}: {e}")
             return []
     
-    def run(self, specific_products: Optional[List[str]] = None):
+    async def run(self, specific_products: Optional[List[str]] = None):
         """Main execution method"""
+        # Supabase calls block, so they run on a single writer thread off the event loop
+        db_writer = ThreadPoolExecutor(max_workers=1)
         try:
-            products = self.get_product_list()
-            
-            if specific_products:
-                products = [p for p in products if p['name'] in specific_products]
-            
-            total_inserted = 0
-            
-            for i, product in enumerate(products, 1):
-                logger.info(f"Processing {i}/{len(products)}: {product['name']}")
+            # Pooled keep-alive connections avoid a TLS handshake per request
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=POOL_CONNECTIONS, max_keepalive_connections=POOL_CONNECTIONS),
+                retries=MAX_RETRIES
+            )
+            async with httpx.AsyncClient(headers=self.headers, transport=transport) as client:
+                products = await self.get_product_list(client)
                 
-                # Scrape
-                records = self.scrape_product(product['id'], product['name'])
+                if specific_products:
+                    products = [p for p in products if p['name'] in specific_products]
                 
-                if records:
-                    # Insert to database
-                    inserted = self.db.insert_price_records(records)
-                    total_inserted += inserted
+                # Scrape products concurrently, bounded by the semaphore
+                sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+                loop = asyncio.get_running_loop()
+                
+                async def process(i, product):
+                    async with sem:
+                        records = await self.scrape_product(client, product['id'], product['name'])
+                    
+                    logger.info(f"Processing {i}/{len(products)}: {product['name']}")
+                    if not records:
+                        return 0
+                    
+                    # Insert to database on the writer thread while other pages keep downloading
+                    inserted = await loop.run_in_executor(db_writer, self.db.insert_price_records, records)
                     logger.info(f"Inserted {inserted} new records for {product['name']}")
+                    return inserted
                 
-                # Polite delay
-                if i < len(products):
-                    time.sleep(REQUEST_DELAY)
+                results = await asyncio.gather(*[process(i, p) for i, p in enumerate(products, 1)])
+            
+            total_inserted = sum(results)
             
             logger.info(f"Scraping complete. Total new records inserted: {total_inserted}")
             return total_inserted
@@ -490,6 +648,13 @@ class KAMISScraper:
         except Exception as e:
             logger.error(f"Scraper failed: {e}")
             raise
+        finally:
+            db_writer.shutdown(wait=True)
+            # Persist what was stored even if the run failed part way
+            try:
+                self.db.save_bloom()
+            except Exception as e:
+                logger.error(f"Failed to save {BLOOM_FILE}: {e}")
 
 
 def main():
@@ -498,10 +663,10 @@ def main():
     
     # Optional: Scrape only specific products for testing
     # test_products = ["Dry Maize", "Beans"]
-    # scraper.run(specific_products=test_products)
+    # asyncio.run(scraper.run(specific_products=test_products))
     
     # Scrape all products
-    scraper.run()
+    asyncio.run(scraper.run())
 
 
 if __name__ == "__main__":